@@ -1,6 +1,24 @@
-import copy
-import heapq
-from typing import List, Tuple, Optional
+import logging
+import math
+from typing import Any, List, Optional, Sequence, Tuple
+
+from solver_core import (
+    MAX_CAPACITY,
+    MAX_COLORS,
+    State,
+    pack_tube,
+    pour,
+    specialize,
+    state_heuristic,
+    state_is_solved,
+    state_key,
+    state_moves,
+    unpack_tube,
+    unpour,
+)
+
+log = logging.getLogger(__name__)
+
 
 class WaterSortPuzzle:
     def __init__(self, tubes: List[List[str]]):
@@ -10,132 +28,165 @@ class WaterSortPuzzle:
         Args:
             tubes (list): A list of lists representing the tubes. Each sublist contains strings for colors or '' for empty spaces.
         """
-        self.tubes = tubes
         self.num_tubes = len(tubes)
         self.tube_capacity = len(tubes[0])
+        if self.tube_capacity > MAX_CAPACITY:
+            raise ValueError(f"Tube capacity {self.tube_capacity} exceeds the maximum of {MAX_CAPACITY}.")
 
-    def is_solved(self) -> bool:
+        self.colors = [''] + sorted({color for tube in tubes for color in tube if color != ''})
+        if len(self.colors) - 1 > MAX_COLORS:
+            raise ValueError(f"{len(self.colors) - 1} colors exceed the maximum of {MAX_COLORS}.")
+
+        codes = {color: code for code, color in enumerate(self.colors)}
+        self.tubes = [pack_tube([codes[color] for color in tube]) for tube in tubes]
+
+    def snapshot(self) -> State:
         """
-        Check if the puzzle is solved.
+        Return the current tubes as an immutable state.
+
+        The packed tubes are plain ints, so a shallow tuple is a complete copy.
 
         Returns:
-            bool: True if all tubes are either empty or contain only one color, False otherwise.
+            tuple: The packed tubes.
         """
-        for tube in self.tubes:
-            if len(set(tube)) > 1:
-                return False
-        return True
+        return tuple(self.tubes)
 
-    def get_valid_moves(self) -> List[Tuple[int, int]]:
+    def decode(self, tubes: Optional[Sequence[int]] = None) -> List[List[str]]:
         """
-        Generate all valid moves as (from_tube, to_tube) pairs.
+        Convert packed tubes back to lists of color strings.
+
+        Args:
+            tubes (list, optional): Packed tubes to decode. Defaults to the current puzzle tubes.
 
         Returns:
-            list: A list of tuples representing valid moves. Each tuple is (from_tube, to_tube).
+            list: A list of lists of color strings, with '' for empty spaces.
         """
-        moves = []
-        for from_tube in range(self.num_tubes):
-            if not any(color != '' for color in self.tubes[from_tube]):
-                continue
-
-            from_color = None
-            for color in reversed(self.tubes[from_tube]):
-                if color != '':
-                    from_color = color
-                    break
+        if tubes is None:
+            tubes = self.tubes
+        return [[self.colors[code] for code in unpack_tube(tube, self.tube_capacity)] for tube in tubes]
 
-            for to_tube in range(self.num_tubes):
-                if from_tube == to_tube:
-                    continue
+    def is_solved(self) -> bool:
+        """
+        Check if the puzzle is solved.
 
-                if not any(color != '' for color in self.tubes[to_tube]):
-                    moves.append((from_tube, to_tube))
-                    continue
+        Returns:
+            bool: True if all tubes are either empty or full of only one color, False otherwise.
+        """
+        return state_is_solved(self.snapshot(), self.tube_capacity)
 
-                to_color = None
-                for color in reversed(self.tubes[to_tube]):
-                    if color != '':
-                        to_color = color
-                        break
+    def get_valid_moves(self, last_move: Optional[Tuple[int, int]] = None) -> List[Tuple[int, int]]:
+        """
+        Generate all useful valid moves as (from_tube, to_tube) pairs.
 
-                if to_color == from_color and self.tubes[to_tube].count('') > 0:
-                    moves.append((from_tube, to_tube))
+        Args:
+            last_move (tuple, optional): The move that produced the current state; its reverse is skipped.
 
-        return moves
+        Returns:
+            list: A list of tuples representing valid moves. Each tuple is (from_tube, to_tube).
+        """
+        last_from, last_to = last_move if last_move is not None else (-1, -1)
+        return state_moves(self.snapshot(), self.tube_capacity, last_from, last_to)
 
-    def apply_move(self, move: Tuple[int, int]) -> None:
+    def apply_move(self, move: Tuple[int, int]) -> int:
         """
         Apply a move to the puzzle.
 
         Args:
             move (tuple): A tuple (from_tube, to_tube) representing the move to apply.
+
+        Returns:
+            int: The number of slots poured, needed to undo the move.
         """
         from_tube, to_tube = move
+        self.tubes[from_tube], self.tubes[to_tube], amount = pour(
+            self.tubes[from_tube], self.tubes[to_tube], self.tube_capacity)
+        return amount
 
-        from_color = None
-        num_to_move = 0
+    def undo_move(self, move: Tuple[int, int], amount: int) -> None:
+        """
+        Undo a move and restore the tube states.
 
-        for i in range(len(self.tubes[from_tube]) - 1, -1, -1):
-            if self.tubes[from_tube][i] != '':
-                if from_color is None:
-                    from_color = self.tubes[from_tube][i]
-                    num_to_move = 1
-                elif self.tubes[from_tube][i] == from_color:
-                    num_to_move += 1
-                else:
-                    break
+        Args:
+            move (tuple): A tuple (from_tube, to_tube) representing the move to undo.
+            amount (int): The number of slots poured by the move, as returned by apply_move.
+        """
+        from_tube, to_tube = move
+        self.tubes[from_tube], self.tubes[to_tube] = unpour(
+            self.tubes[from_tube], self.tubes[to_tube], amount)
 
-        empty_slots = self.tubes[to_tube].count('')
+    def heuristic(self) -> int:
+        """
+        Calculate the heuristic cost of the current puzzle state.
 
-        num_to_move = min(num_to_move, empty_slots)
+        The estimate is consistent, as described in solver_core.state_heuristic.
 
-        for _ in range(num_to_move):
-            for i in range(len(self.tubes[from_tube]) - 1, -1, -1):
-                if self.tubes[from_tube][i] != '':
-                    color = self.tubes[from_tube][i]
-                    self.tubes[from_tube][i] = ''
-                    break
+        Returns:
+            int: The heuristic cost based on color boundaries inside tubes plus the extra tubes sharing a bottom color.
+        """
+        return state_heuristic(self.snapshot(), self.tube_capacity)
 
-            for i in range(len(self.tubes[to_tube])):
-                if self.tubes[to_tube][i] == '':
-                    self.tubes[to_tube][i] = color
-                    break
 
-    def undo_move(self, move: Tuple[int, int], color: str) -> None:
+class BucketQueue:
+    def __init__(self):
         """
-        Undo a move and restore the tube states.
+        Initialize an empty priority queue for small non-negative integer priorities.
 
-        Args:
-            move (tuple): A tuple (from_tube, to_tube) representing the move to undo.
-            color (str): The color being moved back.
+        Items are kept in one list per priority, so push and pop are O(1)
+        apart from skipping over empty buckets. Items with equal priority
+        come out last in, first out.
         """
-        from_tube, to_tube = move
+        self.buckets = []
+        self.min_priority = 0
+        self.size = 0
 
-        for i in range(len(self.tubes[to_tube]) - 1, -1, -1):
-            if self.tubes[to_tube][i] != '':
-                self.tubes[to_tube][i] = ''
-                break
+    def __len__(self) -> int:
+        return self.size
 
-        for i in range(len(self.tubes[from_tube])):
-            if self.tubes[from_tube][i] == '':
-                self.tubes[from_tube][i] = color
-                break
+    def push(self, priority: int, item: Any) -> None:
+        """
+        Add an item to the queue.
 
-    def heuristic(self) -> int:
+        Args:
+            priority (int): The item's priority; lower values are popped first.
+            item: The payload to store.
         """
-        Calculate the heuristic cost of the current puzzle state.
+        while len(self.buckets) <= priority:
+            self.buckets.append([])
+        self.buckets[priority].append(item)
+        if priority < self.min_priority:
+            self.min_priority = priority
+        self.size += 1
+
+    def pop(self) -> Tuple[int, Any]:
+        """
+        Remove and return an item with the lowest priority.
 
         Returns:
-            int: The heuristic cost based on the number of mixed colors and empty spaces in unsolved tubes.
+            tuple: (priority, item) for the removed item.
         """
-        cost = 0
-        for tube in self.tubes:
-            unique_colors = set([color for color in tube if color != ''])
-            if len(unique_colors) > 1:
-                cost += len(unique_colors) - 1
-            if '' in tube and len(unique_colors) > 0:
-                cost += tube.count('')
-        return cost
+        while not self.buckets[self.min_priority]:
+            self.min_priority += 1
+        self.size -= 1
+        return self.min_priority, self.buckets[self.min_priority].pop()
+
+
+def _reconstruct_path(nodes: List[Tuple[int, Optional[Tuple[int, int]]]], node_id: int) -> List[Tuple[int, int]]:
+    """
+    Walk parent links back to the root to recover the moves leading to a node.
+
+    Args:
+        nodes (list): (parent_id, move) pairs indexed by node id. The root has parent -1.
+        node_id (int): The node to reconstruct the path for.
+
+    Returns:
+        list: The moves from the initial state to the node, in order.
+    """
+    path = []
+    while node_id > 0:
+        node_id, move = nodes[node_id]
+        path.append(move)
+    path.reverse()
+    return path
 
 
 def a_star_solver(puzzle: WaterSortPuzzle) -> Optional[List[Tuple[int, int]]]:
@@ -148,50 +199,144 @@ def a_star_solver(puzzle: WaterSortPuzzle) -> Optional[List[Tuple[int, int]]]:
     Returns:
         list: A list of moves (from_tube, to_tube) representing the solution path, or None if no solution exists.
     """
-    initial_state = copy.deepcopy(puzzle.tubes)
-    priority_queue = []
-    heapq.heappush(priority_queue, (0, 0, initial_state, []))
-    visited_states = set()
+    kernels = specialize(puzzle.num_tubes, puzzle.tube_capacity)
+    initial_state = puzzle.snapshot()
+    # Each node only records its parent and the move that produced it; the
+    # path is rebuilt once a solution is found.
+    nodes = [(-1, None)]
+    # f-values are small integers, so a bucket queue replaces a binary heap.
+    priority_queue = BucketQueue()
+    initial_key = state_key(initial_state)
+    priority_queue.push(0, (0, hash(initial_key), 0, initial_state, initial_key))
+    # Canonical keys of expanded states, keyed by their hash computed once per
+    # node; the stored key guards against collisions, which at worst cause a
+    # state to be expanded twice. state_heuristic is consistent, so f never
+    # decreases along a path and a state is first popped with its cheapest
+    # cost: closed states never need reopening and their successors can be
+    # dropped on push.
+    closed_states = {}
+    # Decoding states for the trace is expensive, so check the level once.
+    debug = log.isEnabledFor(logging.DEBUG)
 
     while priority_queue:
-        _, cost, current_state, path = heapq.heappop(priority_queue)
+        _, (cost, key_hash, node_id, current_state, current_key) = priority_queue.pop()
 
-        print(f"Current State: {current_state}, Cost: {cost}, Path: {path}")
+        if debug:
+            log.debug("Current State: %s, Cost: %d, Path: %s",
+                      puzzle.decode(current_state), cost, _reconstruct_path(nodes, node_id))
 
-        state_tuple = tuple(tuple(tube) for tube in current_state)
-        if state_tuple in visited_states:
-            print("State already visited, skipping.")
+        if closed_states.get(key_hash) == current_key:
+            log.debug("State already visited, skipping.")
             continue
-        visited_states.add(state_tuple)
+        closed_states[key_hash] = current_key
 
-        puzzle.tubes = copy.deepcopy(current_state)
-        if puzzle.is_solved():
-            print("Solution found!")
-            return path
+        if kernels.is_solved(current_state):
+            log.debug("Solution found!")
+            return _reconstruct_path(nodes, node_id)
 
-        valid_moves = puzzle.get_valid_moves()
-        print(f"Valid Moves: {valid_moves}")
+        last_from, last_to = nodes[node_id][1] if node_id else (-1, -1)
+        valid_moves = kernels.moves(current_state, last_from, last_to)
+        if debug:
+            log.debug("Valid Moves: %s", valid_moves)
         for move in valid_moves:
-            puzzle.tubes = copy.deepcopy(current_state)
-            puzzle.apply_move(move)
-            new_state = copy.deepcopy(puzzle.tubes)
+            new_state = kernels.apply(current_state, move)
+            new_key = state_key(new_state)
+            new_hash = hash(new_key)
+            if closed_states.get(new_hash) == new_key:
+                continue
 
-            print(f"Applying Move: {move}")
-            print(f"Resulting State: {new_state}")
+            if debug:
+                log.debug("Applying Move: %s", move)
+                log.debug("Resulting State: %s", puzzle.decode(new_state))
 
             move_cost = 1
-            heuristic_cost = puzzle.heuristic()
+            heuristic_cost = kernels.heuristic(new_state)
             total_cost = cost + move_cost + heuristic_cost
-            new_path = path + [move]
+            new_id = len(nodes)
+            nodes.append((node_id, move))
 
-            print(f"Move Cost: {move_cost}, Heuristic Cost: {heuristic_cost}, Total Cost: {total_cost}")
+            if debug:
+                log.debug("Move Cost: %d, Heuristic Cost: %d, Total Cost: %d", move_cost, heuristic_cost, total_cost)
 
-            heapq.heappush(priority_queue, (total_cost, cost + move_cost, new_state, new_path))
+            priority_queue.push(total_cost, (cost + move_cost, new_hash, new_id, new_state, new_key))
 
-    print("No solution found.")
+    log.debug("No solution found.")
     return None
 
 
+def ida_star_solver(puzzle: WaterSortPuzzle, table_size: int = 1 << 16) -> Optional[List[Tuple[int, int]]]:
+    """
+    Solve the Water Sort Puzzle using the IDA* algorithm.
+
+    Runs depth-first searches bounded by f = g + h, raising the bound to the
+    smallest f that exceeded it until a solution is found. Apart from the
+    current path, memory is limited to a fixed-size transposition table.
+    The puzzle is modified in place with apply_move/undo_move, so it is back
+    in its initial state on return.
+
+    Args:
+        puzzle (WaterSortPuzzle): The puzzle instance to solve.
+        table_size (int): Number of slots in the transposition table used to cut off repeated states.
+
+    Returns:
+        list: A list of moves (from_tube, to_tube) representing the solution path, or None if no solution exists.
+    """
+    kernels = specialize(puzzle.num_tubes, puzzle.tube_capacity)
+    found = -1
+    path = []
+    initial_state = puzzle.snapshot()
+    # Canonical keys of the states on the current path, to avoid cycles.
+    on_path = {state_key(initial_state)}
+    # Slot hash(key) % table_size holds (key, cost) for the cheapest cost at
+    # which a state was last reached in this iteration; reaching it again at
+    # no lower cost leaves less budget for the same subtree. New entries always
+    # overwrite the slot, so memory stays fixed and only pruning is lost.
+    table = [None] * table_size
+
+    def search(state: State, cost: int, bound: int, last_from: int, last_to: int) -> float:
+        total_cost = cost + kernels.heuristic(state)
+        if total_cost > bound:
+            return total_cost
+        if kernels.is_solved(state):
+            return found
+
+        minimum = math.inf
+        for move in kernels.moves(state, last_from, last_to):
+            amount = puzzle.apply_move(move)
+            new_state = tuple(puzzle.tubes)
+            key = state_key(new_state)
+            slot = hash(key) % table_size
+            entry = table[slot]
+            if entry is not None and entry[0] == key and entry[1] <= cost + 1:
+                puzzle.undo_move(move, amount)
+                continue
+            table[slot] = (key, cost + 1)
+            if key not in on_path:
+                on_path.add(key)
+                path.append(move)
+                result = search(new_state, cost + 1, bound, move[0], move[1])
+                on_path.remove(key)
+                if result == found:
+                    puzzle.undo_move(move, amount)
+                    return found
+                path.pop()
+                minimum = min(minimum, result)
+            puzzle.undo_move(move, amount)
+        return minimum
+
+    bound = kernels.heuristic(initial_state)
+    while True:
+        log.debug("Searching with bound %d", bound)
+        table[:] = [None] * table_size
+        result = search(initial_state, 0, bound, -1, -1)
+        if result == found:
+            log.debug("Solution found!")
+            return path
+        if result == math.inf:
+            log.debug("No solution found.")
+            return None
+        bound = result
+
 if __name__ == "__main__":
     initial_tubes = [
         ['B', 'F', 'D', 'B'],
@@ -0,0 +1,324 @@
+from functools import lru_cache
+from typing import Callable, List, NamedTuple, Sequence, Tuple
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; the kernels run as plain Python without it.
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+# Each tube is packed into a single integer: slot i (0 = bottom) holds a 4-bit
+# color code in bits 4*i..4*i+3 and the fill height lives in bits 56..59.
+# Code 0 marks an empty slot. Keeping every word below 2**63 lets the kernels
+# below be compiled by Numba as signed 64-bit integer arithmetic, which leaves
+# room for up to 15 colors and 14 slots.
+SLOT_BITS = 4
+SLOT_MASK = 0xF
+HEIGHT_SHIFT = 56
+MAX_CAPACITY = HEIGHT_SHIFT // SLOT_BITS
+MAX_COLORS = SLOT_MASK
+REP = 0x11111111111111
+
+
+def pack_tube(codes: List[int]) -> int:
+    """
+    Pack a list of color codes (bottom to top, 0 for empty slots) into a tube word.
+
+    Args:
+        codes (list): Color codes of the filled slots followed by zeros.
+
+    Returns:
+        int: The packed tube.
+    """
+    tube = 0
+    height = 0
+    for i, code in enumerate(codes):
+        if code:
+            tube |= code << (i * SLOT_BITS)
+            height = i + 1
+    return tube | (height << HEIGHT_SHIFT)
+
+
+def unpack_tube(tube: int, capacity: int) -> List[int]:
+    """
+    Unpack a tube word into a list of color codes from bottom to top.
+
+    Args:
+        tube (int): The packed tube.
+        capacity (int): Number of slots in the tube.
+
+    Returns:
+        list: The color code of every slot, 0 for empty slots.
+    """
+    return [(tube >> (i * SLOT_BITS)) & SLOT_MASK for i in range(capacity)]
+
+
+@njit(cache=True)
+def top_run_length(tube: int) -> int:
+    """Return how many slots from the top of a packed tube share the top color."""
+    height = tube >> HEIGHT_SHIFT
+    if height == 0:
+        return 0
+    color = (tube >> ((height - 1) * SLOT_BITS)) & SLOT_MASK
+
+    # XOR against the top color repeated in every lane zeroes the matching
+    # slots; folding each nibble onto its low bit leaves bit 4*i set exactly
+    # when slot i differs from the top.
+    diff = (tube ^ (color * REP)) & ((1 << (height * SLOT_BITS)) - 1)
+    diff |= diff >> 2
+    diff |= diff >> 1
+    diff &= REP
+    if diff == 0:
+        return height
+
+    # Locate the highest differing slot with a fixed-depth binary search.
+    slot = 0
+    if diff >> 32:
+        diff >>= 32
+        slot += 8
+    if diff >> 16:
+        diff >>= 16
+        slot += 4
+    if diff >> 8:
+        diff >>= 8
+        slot += 2
+    if diff >> 4:
+        slot += 1
+    return height - 1 - slot
+
+
+@njit(cache=True)
+def pour(from_word: int, to_word: int, capacity: int) -> Tuple[int, int, int]:
+    """
+    Pour the top run of one packed tube into another.
+
+    Args:
+        from_word (int): The packed source tube.
+        to_word (int): The packed destination tube.
+        capacity (int): Number of slots in each tube.
+
+    Returns:
+        tuple: (new_from_word, new_to_word, amount) where amount is the number of slots poured.
+    """
+    from_height = from_word >> HEIGHT_SHIFT
+    to_height = to_word >> HEIGHT_SHIFT
+    color = (from_word >> ((from_height - 1) * SLOT_BITS)) & SLOT_MASK
+    amount = min(top_run_length(from_word), capacity - to_height)
+
+    from_height -= amount
+    new_from = (from_word & ((1 << (from_height * SLOT_BITS)) - 1)) | (from_height << HEIGHT_SHIFT)
+    run = (color * REP) & ((1 << (amount * SLOT_BITS)) - 1)
+    new_to = ((to_word & ((1 << (to_height * SLOT_BITS)) - 1))
+              | (run << (to_height * SLOT_BITS))
+              | ((to_height + amount) << HEIGHT_SHIFT))
+    return new_from, new_to, amount
+
+
+@njit(cache=True)
+def unpour(from_word: int, to_word: int, amount: int) -> Tuple[int, int]:
+    """
+    Reverse a pour by moving the top slots of the destination back to the source.
+
+    Args:
+        from_word (int): The packed source tube of the original pour.
+        to_word (int): The packed destination tube of the original pour.
+        amount (int): The number of slots poured, as returned by pour.
+
+    Returns:
+        tuple: (new_from_word, new_to_word) as they were before the pour.
+    """
+    from_height = from_word >> HEIGHT_SHIFT
+    to_height = (to_word >> HEIGHT_SHIFT) - amount
+
+    run = (to_word >> (to_height * SLOT_BITS)) & ((1 << (amount * SLOT_BITS)) - 1)
+    new_to = (to_word & ((1 << (to_height * SLOT_BITS)) - 1)) | (to_height << HEIGHT_SHIFT)
+    new_from = ((from_word & ((1 << (from_height * SLOT_BITS)) - 1))
+                | (run << (from_height * SLOT_BITS))
+                | ((from_height + amount) << HEIGHT_SHIFT))
+    return new_from, new_to
+
+
+State = Tuple[int, ...]
+
+
+class Kernels(NamedTuple):
+    """State functions specialized for one puzzle shape, as built by specialize()."""
+    is_solved: Callable[[Sequence[int]], bool]
+    moves: Callable[..., List[Tuple[int, int]]]
+    apply: Callable[[State, Tuple[int, int]], State]
+    heuristic: Callable[[Sequence[int]], int]
+
+
+@lru_cache(maxsize=None)
+def specialize(num_tubes: int, capacity: int) -> Kernels:
+    """
+    Build the state functions for a fixed number of tubes and tube capacity.
+
+    The shape never changes during a search, so it is captured as closure
+    constants instead of being passed and re-derived on every call. Under
+    Numba each shape compiles to its own machine code with those constants
+    folded in.
+
+    Args:
+        num_tubes (int): Number of tubes in every state.
+        capacity (int): Number of slots in each tube.
+
+    Returns:
+        Kernels: The specialized is_solved, moves, apply and heuristic functions.
+    """
+    # A solved tube of color c is exactly full_height | c * full_rep.
+    full_height = capacity << HEIGHT_SHIFT
+    full_rep = REP & ((1 << (capacity * SLOT_BITS)) - 1)
+    # pair_masks[h] covers the nibbles of slot_i ^ slot_i+1 for 0 <= i < h - 1.
+    pair_masks = tuple((1 << (max(height - 1, 0) * SLOT_BITS)) - 1 for height in range(capacity + 1))
+    max_moves = num_tubes * (num_tubes - 1)
+
+    @njit(cache=True)
+    def is_solved(state):
+        for tube in state:
+            if tube != 0 and tube != full_height | (tube & SLOT_MASK) * full_rep:
+                return False
+        return True
+
+    @njit(cache=True)
+    def moves(state, last_from=-1, last_to=-1):
+        heights = [0] * num_tubes
+        tops = [0] * num_tubes
+        for i in range(num_tubes):
+            height = state[i] >> HEIGHT_SHIFT
+            heights[i] = height
+            if height:
+                tops[i] = (state[i] >> ((height - 1) * SLOT_BITS)) & SLOT_MASK
+
+        result = [(0, 0)] * max_moves
+        count = 0
+        for from_tube in range(num_tubes):
+            from_color = tops[from_tube]
+            if from_color == 0:
+                continue
+            from_height = heights[from_tube]
+            single_color = top_run_length(state[from_tube]) == from_height
+            if single_color and from_height == capacity:
+                continue
+
+            for to_tube in range(num_tubes):
+                if from_tube == to_tube:
+                    continue
+                if from_tube == last_to and to_tube == last_from:
+                    continue
+
+                to_height = heights[to_tube]
+                if to_height == 0:
+                    if not single_color:
+                        result[count] = (from_tube, to_tube)
+                        count += 1
+                elif to_height < capacity and tops[to_tube] == from_color:
+                    result[count] = (from_tube, to_tube)
+                    count += 1
+
+        return result[:count]
+
+    def apply(state, move):
+        from_tube, to_tube = move
+        new_state = list(state)
+        new_state[from_tube], new_state[to_tube], _ = pour(state[from_tube], state[to_tube], capacity)
+        return tuple(new_state)
+
+    @njit(cache=True)
+    def heuristic(state):
+        cost = 0
+        bottoms = 0
+        for tube in state:
+            if tube == 0:
+                continue
+            bit = 1 << (tube & SLOT_MASK)
+            if bottoms & bit:
+                cost += 1
+            bottoms |= bit
+
+            # Nibble i of tube ^ (tube >> 4) is nonzero where slots i and i + 1
+            # differ. Fold each nibble onto its low bit, then multiplying by REP
+            # sums those bits into the nibble just below the height field.
+            boundaries = (tube ^ (tube >> SLOT_BITS)) & pair_masks[tube >> HEIGHT_SHIFT]
+            boundaries |= boundaries >> 2
+            boundaries |= boundaries >> 1
+            boundaries &= REP
+            cost += ((boundaries * REP) >> (HEIGHT_SHIFT - SLOT_BITS)) & SLOT_MASK
+        return cost
+
+    return Kernels(is_solved, moves, apply, heuristic)
+
+
+def state_is_solved(state: Sequence[int], capacity: int) -> bool:
+    """
+    Check if a packed state is solved.
+
+    Args:
+        state (tuple): The packed tubes.
+        capacity (int): Number of slots in each tube.
+
+    Returns:
+        bool: True if all tubes are either empty or full of only one color, False otherwise.
+    """
+    return specialize(len(state), capacity).is_solved(state)
+
+
+def state_moves(state: Sequence[int], capacity: int, last_from: int = -1, last_to: int = -1) -> List[Tuple[int, int]]:
+    """
+    Generate the useful valid moves of a packed state as (from_tube, to_tube) pairs.
+
+    Three kinds of legal moves are pruned because they never shorten a
+    solution: pouring a single-color tube into an empty one only swaps two
+    tubes, pouring out of a full single-color tube only undoes a finished
+    tube, and reversing the previous move gives a state its parent reaches in
+    one move.
+
+    Args:
+        state (tuple): The packed tubes.
+        capacity (int): Number of slots in each tube.
+        last_from (int): Source tube of the move that produced this state, or -1.
+        last_to (int): Destination tube of the move that produced this state, or -1.
+
+    Returns:
+        list: A list of tuples representing valid moves. Each tuple is (from_tube, to_tube).
+    """
+    return specialize(len(state), capacity).moves(state, last_from, last_to)
+
+
+def state_key(state: State) -> State:
+    """
+    Return the canonical form of a packed state for duplicate detection.
+
+    Tube order does not affect which moves are possible or how many are
+    needed, so states that differ only by a permutation of tubes share a key.
+
+    Args:
+        state (tuple): The packed tubes.
+
+    Returns:
+        tuple: The packed tubes in sorted order.
+    """
+    return tuple(sorted(state))
+
+
+def state_heuristic(state: Sequence[int], capacity: int) -> int:
+    """
+    Calculate the heuristic cost of a packed state.
+
+    The estimate counts color boundaries inside tubes plus, for each color,
+    the extra tubes that have it at the bottom. A single pour removes at most
+    one boundary, or empties one tube whose color also sits at the bottom of
+    another, so the estimate drops by at most one per move. That makes it
+    consistent, and it is zero in every solved state.
+
+    Args:
+        state (tuple): The packed tubes.
+        capacity (int): Number of slots in each tube.
+
+    Returns:
+        int: The heuristic cost based on mixed tubes and colors split across several tubes.
+    """
+    return specialize(len(state), capacity).heuristic(state)